@@ -630,6 +630,17 @@ exports.bindCommands = function bindCommands(forum) {
         }
     }
 
+    /**
+     * Matches a line that mentions the bot followed by a command.
+     *
+     * Built once per bound forum instead of for every line of every post that is parsed.
+     *
+     * @private
+     *
+     * @type {RegExp}
+     */
+    const mentionCommand = new RegExp(`^@${forum.username}\\s\\S{3,}(\\s|$)`, 'i');
+
     /**
      * Parse command definitions from a line of text
      *
@@ -640,7 +651,7 @@ exports.bindCommands = function bindCommands(forum) {
      */
     function parseLine(line) {
         let args, mention, commandText;
-        if (new RegExp(`^@${forum.username}\\s\\S{3,}(\\s|$)`, 'i').test(line)) {
+        if (mentionCommand.test(line)) {
             args = line.split(/\s+/);
             args.shift();
             commandText = args.shift();
@@ -163,16 +163,33 @@ exports.parseJSON = function parseJSON(json) {
     return json;
 };
 
+/**
+ * Process the items of an array one after another
+ *
+ * Items are read by index and the processed ones are removed in a single splice once iteration stops, so draining
+ * a large page of results stays linear while the caller's array is still consumed as before.
+ *
+ * @param {Array<*>} arr Items to process
+ * @param {function} each Promise returning function to process each item with
+ * @returns {Promise} Resolves when all items have been processed, rejects on the first failure
+ */
 exports.iterate = function iterate(arr, each) {
     return new Promise((resolve, reject) => {
+        let idx = 0;
+        const consume = () => arr && arr.splice(0, idx);
         const next = () => {
-            if (!arr || !arr.length) {
+            if (!arr || idx >= arr.length) {
+                consume();
                 return resolve();
             }
-            const item = arr.shift();
+            const item = arr[idx];
+            idx += 1;
             return each(item)
                 .then(() => next())
-                .catch(reject);
+                .catch((err) => {
+                    consume();
+                    reject(err);
+                });
         };
         next();
     });
@@ -4,7 +4,7 @@
  */
 
 const utils = require('../lib/utils');
-const debug = require('debug')('sockbot:plugins:summoner');
+const debug = require('debug')('sockbot:plugins:clippy');
 const { NodeHtmlMarkdown } = require('node-html-markdown');
 const fs = require('fs');
 const path = require('path');
@@ -22,6 +22,8 @@ async function moderateContent(content) {
     return !moderation_result;
 }
 
+const command_word = /(^| )#/;
+
 // system_message is initialized with the contents of the file ../system_message.txt
 
 const default_system_message_path = path.join(__dirname, 'system_message.txt');
@@ -44,7 +46,7 @@ function set_system_message(topic_id, message) {
 }
 
 let model = process.env.OPENROUTER_MODEL || "meta-llama/llama-3-70b-instruct";
-let character_limit = process.env.OPENROUTER_CHARACTER_LIMIT || 25000;
+let character_limit = Number(process.env.OPENROUTER_CHARACTER_LIMIT) || 25000;
 
 const system_message_complement = `
 You're talking in a forum, and your answers should follow the markdown format, without any links or images.
@@ -52,22 +54,75 @@ All usernames are prefixed with an '@' character.
 
 Your username in the forum is 'clippy'.`;
 
-function format_system_message(topic_id) {
-    let system_message = get_system_message(topic_id);
+const system_suffix = `\n${system_message_complement}`;
+
+function format_system_message(system_message) {
     return {
         role: "system",
-        content: system_message + '\n' + system_message_complement
+        content: system_message + system_suffix
     };
 }
 
+// fetch() keeps connections to the same origin alive in its global pool, so every completion request goes
+// through one reusable endpoint and header set instead of rebuilding them per call.
+const openrouter_url = 'https://openrouter.ai/api/v1/chat/completions';
+const api_headers = {
+    'Authorization': `Bearer ${process.env.OPENROUTER_API_KEY}`,
+    'X-Title': 'Clippy',
+    'Content-Type': 'application/json'
+};
+
+// Bound how many completions run at once: a burst of mentions waits for a free slot instead of opening an
+// unbounded number of concurrent requests against the OpenRouter rate limits. At least one slot is always
+// available, a limit below that would leave every mention waiting forever.
+const max_generations = Math.max(1, Math.floor(Number(process.env.OPENROUTER_MAX_CONCURRENCY) || 4));
+let active_slots = 0;
+const slot_waiters = [];
+
+/**
+ * Take a completion slot, waiting in arrival order while all of them are in use.
+ *
+ * @returns {Promise} Resolves once the caller holds a slot
+ */
+function acquire_slot() {
+    if (active_slots < max_generations) {
+        active_slots += 1;
+        return Promise.resolve();
+    }
+    return new Promise((resolve) => slot_waiters.push(resolve));
+}
+
+/**
+ * Give a completion slot back, handing it straight to the oldest waiter if there is one.
+ */
+function release_slot() {
+    const next = slot_waiters.shift();
+    if (next) {
+        next();
+    } else {
+        active_slots -= 1;
+    }
+}
+
+/**
+ * Generate a completion once a slot is free.
+ *
+ * @param {Array} messages Chat messages to send to the model
+ * @returns {Promise<string>} Resolves to the generated content
+ */
+async function generateLimited(messages) {
+    await acquire_slot();
+    try {
+        return await generateContent(messages);
+    } finally {
+        release_slot();
+    }
+}
+
 async function generateContent(messages) {
-    const response = await fetch("https://openrouter.ai/api/v1/chat/completions", {
+    const response = await fetch(openrouter_url, {
         method: "POST",
-        headers: {
-            "Authorization": `Bearer ${process.env.OPENROUTER_API_KEY}`,
-            "X-Title": `Clippy`,
-            "Content-Type": "application/json"
-        },
+        headers: api_headers,
         body: JSON.stringify({
             model,
             temperature: 0.7,
@@ -76,10 +131,8 @@ async function generateContent(messages) {
         })
     });
     const textData = await response.text();
-    console.log(textData);
+    debug('OpenRouter response: %s', textData);
     const jsonData = JSON.parse(textData);
-    // const jsonData = await response.json();
-    console.log(JSON.stringify(jsonData));
     const content = jsonData.choices[0].message?.content;
 
     // remove any trailing text in the format of <|xyz|>
@@ -90,10 +143,44 @@ async function generateContent(messages) {
     return content;
 }
 
+// Every mention rebuilds the context from the latest posts of the topic, so the same post bodies are converted
+// over and over. Keep the most recently used conversions, keyed by the HTML itself so edited posts miss.
+const md_cache = new Map();
+const md_cache_size = 500;
+
+/**
+ * Convert the HTML of a post to Markdown, reusing the conversion of recently seen posts.
+ *
+ * @param {string} htmlString Post content as HTML
+ * @returns {string} Post content as Markdown
+ */
 function convertHtmlToMarkdown(htmlString) {
-    // Create an instance of NodeHtmlMarkdown
-    const nhm = new NodeHtmlMarkdown();
+    const cached = md_cache.get(htmlString);
+    if (cached !== undefined) {
+        // re-insert to mark the entry as most recently used
+        md_cache.delete(htmlString);
+        md_cache.set(htmlString, cached);
+        return cached;
+    }
+    const markdown = htmlToMarkdown(htmlString);
+    md_cache.set(htmlString, markdown);
+    if (md_cache.size > md_cache_size) {
+        // Map iterates in insertion order, so the first key is the least recently used one
+        md_cache.delete(md_cache.keys().next().value);
+    }
+    return markdown;
+}
+
+// translate() is synchronous and keeps no state between calls, so one configured instance serves every post
+const nhm = new NodeHtmlMarkdown();
 
+/**
+ * Translate the HTML of a post to Markdown, turning emoji images back into their `:name:` text.
+ *
+ * @param {string} htmlString Post content as HTML
+ * @returns {string} Post content as Markdown
+ */
+function htmlToMarkdown(htmlString) {
     // Convert the HTML string to Markdown
     let markdown = nhm.translate(htmlString);
 
@@ -130,12 +217,45 @@ module.exports = function clippy(forum, config) {
 
     function limit_chars(messages, limit) {
         // remove messages from the beginning until the total length is less than the limit or there is less than 5 messages
-        while (count_chars(messages) > limit && messages.length > 5) {
-            messages.shift();
+        // keep a running total and drop them in one splice, instead of recounting and shifting per removed message
+        let total_chars = count_chars(messages);
+        let drop = 0;
+        while (total_chars > limit && messages.length - drop > 5) {
+            total_chars -= messages[drop].content.length;
+            drop += 1;
         }
+        messages.splice(0, drop);
         return messages;
     }
 
+    // context loads still in flight, keyed by topic id and post count
+    const pending_context = new Map();
+
+    /**
+     * Load the latest posts of a topic to use as context.
+     *
+     * Mentions that arrive together in the same topic see the same snapshot of it, so they share a single
+     * load instead of each fetching the same posts.
+     *
+     * @param {Topic} topic Topic to load the context from
+     * @returns {Promise<Array>} Resolves to the context posts, oldest first
+     */
+    function load_context(topic) {
+        const key = `${topic.id}:${topic.postCount}`;
+        let pending = pending_context.get(key);
+        if (!pending) {
+            const contextPosts = [];
+            // topics.loadMore already embeds each post's author, no need to look them up one by one
+            pending = topic.getLatestPosts(async (p, postAuthor) => {
+                contextPosts.push({ content: p.content, author: postAuthor.username });
+            }).then(() => contextPosts);
+            pending_context.set(key, pending);
+            const forget = () => pending_context.delete(key);
+            pending.then(forget, forget);
+        }
+        return pending;
+    }
+
     /**
      * Handle a mention notification.
      *
@@ -147,24 +267,22 @@ module.exports = function clippy(forum, config) {
     async function handler(notification) {
         debug('clippy received a mention notification!');
         try {
-            const user = await notification.getUser();
+            // the user and post lookups are independent round-trips, so issue them together
+            const [user, thepost] = await Promise.all([
+                notification.getUser(),
+                forum.Post.get(notification.postId)
+            ]);
             debug(`clippy responding to ${user.username}`);
 
             const topic_id = notification.topicId;
 
-            const thepost = await forum.Post.get(notification.postId);
-
             if (thepost.content.includes("#show_system_message")) {
                 const system_message = get_system_message(topic_id);
                 return forum.Post.reply(notification.topicId, notification.postId, "#" + system_message);
             }
 
             const topic = await forum.Topic.get(notification.topicId);
-            let contextPosts = [];
-            await topic.getLatestPosts(async (p) => {
-                const postAuthor = await forum.User.get(p.authorId);
-                contextPosts.push({ content: p.content, author: postAuthor.username });
-            });
+            const contextPosts = await load_context(topic);
             let messages = [];
             for (const p of contextPosts) {
 
@@ -176,13 +294,10 @@ module.exports = function clippy(forum, config) {
                 let commands = [];
                 let text = [];
                 lines.forEach(l => {
-                    if (l.split(' ').some(word => word.startsWith('#'))) {
+                    // a word starting with '#' marks a command line; one regex scan instead of splitting each line
+                    if (command_word.test(l)) {
                         commands.push(l);
                     } else {
-                        if (l.includes("#.")) {
-                            console.log("l  includes #.");
-                            console.log(l);
-                        }
                         text.push(l);
                     }
                 });
@@ -193,12 +308,15 @@ module.exports = function clippy(forum, config) {
                     if (sanitizedName.length == 0) {
                         sanitizedName = 'user';
                     }
-                    let role = sanitizedName.toLowerCase().trim() == 'clippy' ? 'assistant' : 'user';
+                    // the sanitized name holds no whitespace, so it can be compared as is
+                    const role = sanitizedName.toLowerCase() === 'clippy' ? 'assistant' : 'user';
 
                     messages.push({
                         role,
                         name: sanitizedName,
-                        content: text
+                        // limit_chars always keeps the last few messages, so clip a single oversized post here
+                        // rather than sending all of it to the model
+                        content: text.length > character_limit ? text.substring(0, character_limit) : text
                     });
                 }
 
@@ -218,13 +336,16 @@ module.exports = function clippy(forum, config) {
             }
             const system_message = get_system_message(topic_id);
             messages = limit_chars(messages, character_limit);
-            messages.unshift(format_system_message(topic_id));
-            console.log(`System message = ${system_message}`);
-            console.log(`Number of context messages: ${contextPosts.length}`);
-            console.log(`Post being answered: ${thepost.content}`);
-            console.log(`Characters in context: ${count_chars(messages)}`)
-            let response = await generateContent(messages);
-            console.log(`Response: ${response}`);
+            messages.unshift(format_system_message(system_message));
+            // debug() only formats its arguments when enabled; guard the one that has to walk the messages
+            if (debug.enabled) {
+                debug('System message = %s', system_message);
+                debug('Number of context messages: %d', contextPosts.length);
+                debug('Post being answered: %s', thepost.content);
+                debug('Characters in context: %d', count_chars(messages));
+            }
+            let response = await generateLimited(messages);
+            debug('Response: %s', response);
             if (!response) {
                 return;
             }
@@ -253,9 +374,28 @@ module.exports = function clippy(forum, config) {
         forum.off('notification:mention', handler);
     }
 
+    /* istanbul ignore else */
+    if (typeof global.describe === 'function') {
+        module.exports.internals.pending_context = pending_context;
+        module.exports.internals.load_context = load_context;
+    }
+
     return {
         activate: activate,
         deactivate: deactivate,
         handler: handler
     };
 };
+
+/* istanbul ignore else */
+if (typeof global.describe === 'function') {
+    //test is running
+    module.exports.internals = {
+        max_generations: max_generations,
+        generateLimited: generateLimited,
+        md_cache: md_cache,
+        md_cache_size: md_cache_size,
+        toMarkdown: convertHtmlToMarkdown,
+        nhm: nhm
+    };
+}
@@ -250,7 +250,7 @@ exports.bindChat = function bindChat(forum) {
          */
         get owner() {
             const ownerId = utils.mapGet(this, 'owner');
-            const owner = utils.mapGet(this, 'users').filter((user) => user.uid === ownerId)[0];
+            const owner = utils.mapGet(this, 'users').find((user) => user.uid === ownerId);
             return forum.User.parse(owner);
         }
 
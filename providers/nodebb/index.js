@@ -86,12 +86,15 @@ class Forum extends EventEmitter {
     /**
      * Base URL for the forum
      *
+     * Read directly from the stored configuration; strings need no defensive copy, and cloning the entire
+     * configuration on every URL built was the most expensive part of it.
+     *
      * @public
      *
      * @type {string}
      */
     get url() {
-        return this.config.core.forum;
+        return utils.mapGet(this, 'config').core.forum;
     }
 
     /**
@@ -102,7 +105,7 @@ class Forum extends EventEmitter {
      * @type{string}
      */
     get username() {
-        return this.config.core.username;
+        return utils.mapGet(this, 'config').core.username;
     }
 
     /**
@@ -470,23 +473,32 @@ class Forum extends EventEmitter {
         });
     }
 
+    /**
+     * Emit a websocket event, retrying while the forum rate limits it
+     *
+     * Rate limited emits are retried up to four times, waiting `delay` milliseconds before each retry.
+     *
+     * @private
+     *
+     * @param {number} delay Milliseconds to wait before each retry
+     * @param {string} event Event to emit
+     * @param {*} args... Event arguments
+     * @returns {Promise<*>} Resolves to result of websocket event
+     *
+     * @promise
+     * @fulfill {*} Result of websocket call
+     */
     _emitWithRetry(delay) {
-        let trials = 5;
-        const args = Array.prototype.slice.call(arguments);
-        args.shift(); // remove the delay parameter
-        const fn = () => new Promise((resolve, reject) => {
-            this._emit.apply(this, args).then(resolve, (err) => {
-                if (trials > 1 && err.message.indexOf('[[error:too-many-') === 0){
-                    trials -= 1;
-                    setTimeout(() => {
-                        fn().then(resolve, reject);
-                    }, delay);
-                } else {
-                    reject(err);
-                }
-            });
+        const trials = 5;
+        const args = Array.prototype.slice.call(arguments, 1); // drop the delay parameter
+        const attempt = (trial) => this._emit.apply(this, args).catch((err) => {
+            if (trial + 1 >= trials || err.message.indexOf('[[error:too-many-') !== 0) {
+                throw err;
+            }
+            return new Promise((resolve) => setTimeout(resolve, delay))
+                .then(() => attempt(trial + 1));
         });
-        return fn();
+        return attempt(0);
     }
 
     /**
@@ -53,10 +53,13 @@ exports.bindNotification = function bindNotification(forum) {
         constructor(payload) {
             payload = utils.parseJSON(payload);
             const body = string(payload.bodyLong || '').unescapeHTML().s;
+            //match the label once and derive the notification type from its subtype
+            const subtype = (/^\[\[\w+:(\w+)/.exec(payload.bodyShort) || [])[1] || '';
+            const subtypeKey = subtype.toLowerCase();
             let type = 'notification';
-            if (/^\[\[\w+:user_posted_to/i.test(payload.bodyShort)) {
+            if (subtypeKey.startsWith('user_posted_to')) {
                 type = 'reply';
-            } else if (/^\[\[\w+:user_mentioned_you_in/i.test(payload.bodyShort)) {
+            } else if (subtypeKey.startsWith('user_mentioned_you_in')) {
                 if (mentionTester.test(body)) {
                     type = 'mention';
                 } else {
@@ -64,8 +67,6 @@ exports.bindNotification = function bindNotification(forum) {
                 }
             }
 
-            const subtype = (/^\[\[\w+:(\w+)/.exec(payload.bodyShort) || [])[1] || '';
-
             const values = {
                 type: type,
                 subtype: subtype,
@@ -434,7 +435,9 @@ exports.bindNotification = function bindNotification(forum) {
 
             //if there's no blacklist, we can ignore the hit for getting the category
             if (ignoreCategories.length) {
-                if (ignoreCategories.some((elem) => elem.toString() === notification.categoryId.toString())) {
+                //resolve the category once rather than once per blacklist entry
+                const categoryId = notification.categoryId.toString();
+                if (ignoreCategories.some((elem) => elem.toString() === categoryId)) {
                     forum.emit('log', `Notification from category ${notification.categoryId} ignored`);
                     return reject('Ignoring notification');
                 }
@@ -473,13 +473,13 @@ exports.bindTopic = function bindTopic(forum) {
         static _getMany(room, query, eachTopic) {
             return new Promise((resolve, reject) => {
                 query.after = 0;
+                const each = (data) => Topic.parseExtended(data)
+                    .then((parsed) => eachTopic(parsed.topic, parsed.user, parsed.category));
                 const iterate = () => forum._emit(room, utils.cloneData(query)).then((results) => {
                     if (!results.topics || !results.topics.length) {
                         return resolve(this);
                     }
                     query.after += results.topics.length;
-                    const each = (data) => Topic.parseExtended(data)
-                        .then((parsed) => eachTopic(parsed.topic, parsed.user, parsed.category));
                     return utils.iterate(results.topics, each)
                         .then(iterate).catch(reject);
                 }).catch(reject);
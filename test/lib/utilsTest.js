@@ -89,6 +89,29 @@ describe('lib/utils', () => {
             const spy = sinon.stub().rejects(new Error('bad'));
             return utils.iterate([0], spy).should.be.rejectedWith('bad');
         });
+        it('should process values in order', () => {
+            const spy = sinon.stub().resolves();
+            return utils.iterate([3, 1, 2], spy).then(() => {
+                spy.args.should.eql([[3], [1], [2]]);
+            });
+        });
+        it('should consume input array', () => {
+            const spy = sinon.stub().resolves();
+            const input = [0, 1, 2];
+            return utils.iterate(input, spy).then(() => {
+                input.should.eql([]);
+            });
+        });
+        it('should leave unprocessed values in input array on reject', () => {
+            const spy = sinon.stub().resolves();
+            spy.onCall(1).rejects('bad');
+            const input = [0, 1, 2, 3];
+            return utils.iterate(input, spy)
+                .catch(() => true)
+                .then(() => {
+                    input.should.eql([2, 3]);
+                });
+        });
     });
     describe('parseJSON()', () => {
         describe('argument is required', () => {
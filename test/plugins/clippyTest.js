@@ -0,0 +1,253 @@
+'use strict';
+
+const chai = require('chai');
+const chaiAsPromised = require('chai-as-promised');
+
+chai.use(chaiAsPromised);
+chai.should();
+
+const sinon = require('sinon');
+chai.use(require('sinon-chai'));
+
+const testModule = require('../../plugins/clippy');
+
+const tick = () => new Promise((resolve) => setImmediate(resolve));
+
+describe('plugins/clippy', () => {
+    let sandbox = null;
+    beforeEach(() => {
+        sandbox = sinon.sandbox.create();
+    });
+    afterEach(() => sandbox.restore());
+    describe('module', () => {
+        it('should export plugin function directly', () => {
+            testModule.should.be.a('function');
+        });
+        it('should return an object with an activate function', () => {
+            testModule().activate.should.be.a('function');
+        });
+        it('should return an object with a deactivate function', () => {
+            testModule().deactivate.should.be.a('function');
+        });
+        it('should return an object with a handler function', () => {
+            testModule().handler.should.be.a('function');
+        });
+    });
+    describe('handler()', () => {
+        let forum = null,
+            notification = null;
+        beforeEach(() => {
+            forum = {
+                Post: {
+                    get: sinon.stub().resolves({
+                        content: '<p>@clippy #show_system_message</p>'
+                    }),
+                    reply: sinon.stub().resolves()
+                },
+                Topic: {
+                    get: sinon.stub().rejects(new Error('topic gone'))
+                },
+                emit: sinon.stub()
+            };
+            notification = {
+                topicId: 42,
+                postId: 7,
+                getUser: sinon.stub().resolves({
+                    username: 'bob'
+                })
+            };
+        });
+        it('should show the system message without looking up the topic', () => {
+            return testModule(forum).handler(notification).then(() => {
+                forum.Topic.get.should.not.have.been.called;
+                forum.Post.reply.should.have.been.calledOnce;
+            });
+        });
+    });
+    describe('generateLimited()', () => {
+        const limit = testModule.internals.max_generations;
+        const generate = testModule.internals.generateLimited;
+        let requests = null;
+        const reply = (content) => ({
+            text: () => Promise.resolve(JSON.stringify({
+                choices: [{
+                    message: {
+                        content: content
+                    }
+                }]
+            }))
+        });
+        const prompt = (call) => JSON.parse(call.args[1].body).messages[0].content;
+        beforeEach(() => {
+            requests = [];
+            sandbox.stub(global, 'fetch').callsFake(() => new Promise((resolve, reject) => {
+                requests.push({
+                    resolve: resolve,
+                    reject: reject
+                });
+            }));
+        });
+        const start = (count, offset) => Array.from({
+            length: count
+        }, (_, i) => generate([{
+            role: 'user',
+            content: `prompt ${(offset || 0) + i}`
+        }]));
+        const drain = () => tick().then(() => {
+            if (requests.length) {
+                requests.shift().resolve(reply('done'));
+                return drain();
+            }
+            return undefined;
+        });
+        it('should allow at least one request in flight', () => {
+            const name = require.resolve('../../plugins/clippy');
+            const cached = require.cache[name];
+            const configured = process.env.OPENROUTER_MAX_CONCURRENCY;
+            process.env.OPENROUTER_MAX_CONCURRENCY = '-1';
+            delete require.cache[name];
+            try {
+                require(name).internals.max_generations.should.equal(1);
+            } finally {
+                require.cache[name] = cached;
+                if (configured === undefined) {
+                    delete process.env.OPENROUTER_MAX_CONCURRENCY;
+                } else {
+                    process.env.OPENROUTER_MAX_CONCURRENCY = configured;
+                }
+            }
+        });
+        it('should resolve to the generated content', () => {
+            const result = start(1)[0];
+            return drain().then(() => result.should.become('done'));
+        });
+        it('should keep at most the concurrency limit of requests in flight', () => {
+            const results = start(limit + 2);
+            return tick().then(() => {
+                global.fetch.should.have.callCount(limit);
+                requests.shift().resolve(reply('done'));
+                return tick();
+            }).then(() => {
+                global.fetch.should.have.callCount(limit + 1);
+                requests.length.should.equal(limit);
+                return drain();
+            }).then(() => Promise.all(results)).then(() => {
+                global.fetch.should.have.callCount(limit + 2);
+            });
+        });
+        it('should serve waiting requests in arrival order', () => {
+            const results = start(limit + 3);
+            return drain().then(() => Promise.all(results)).then(() => {
+                global.fetch.getCalls().map(prompt).should.eql(Array.from({
+                    length: limit + 3
+                }, (_, i) => `prompt ${i}`));
+            });
+        });
+        it('should release the slot when generation rejects', () => {
+            const failed = start(limit);
+            const waiting = start(1, limit)[0];
+            return tick().then(() => {
+                global.fetch.should.have.callCount(limit);
+                requests.splice(0).forEach((request) => request.reject(new Error('bad gateway')));
+                return Promise.all(failed.map((result) => result.should.be.rejectedWith('bad gateway')));
+            }).then(() => drain()).then(() => waiting.should.become('done')).then(() => {
+                const results = start(limit, limit + 1);
+                return tick().then(() => {
+                    global.fetch.should.have.callCount(2 * limit + 1);
+                    return drain();
+                }).then(() => Promise.all(results));
+            });
+        });
+    });
+    describe('load_context()', () => {
+        let internals = null,
+            topic = null,
+            load = null;
+        beforeEach(() => {
+            testModule();
+            internals = testModule.internals;
+            load = Promise.resolve();
+            topic = {
+                id: 42,
+                postCount: 7,
+                getLatestPosts: sinon.stub().callsFake((each) => load
+                    .then(() => each({
+                        content: 'hello'
+                    }, {
+                        username: 'bob'
+                    })))
+            };
+        });
+        it('should resolve to the posts and their authors', () => {
+            return internals.load_context(topic).should.become([{
+                content: 'hello',
+                author: 'bob'
+            }]);
+        });
+        it('should share one load between concurrent calls for the same post count', () => {
+            const first = internals.load_context(topic);
+            const second = internals.load_context(topic);
+            topic.getLatestPosts.should.have.been.calledOnce;
+            second.should.equal(first);
+            return first;
+        });
+        it('should load again when the post count changes', () => {
+            const first = internals.load_context(topic);
+            topic.postCount = 8;
+            internals.load_context(topic).should.not.equal(first);
+            topic.getLatestPosts.should.have.been.calledTwice;
+            return first;
+        });
+        it('should forget a load once it settles', () => {
+            return internals.load_context(topic).then(() => {
+                internals.pending_context.should.not.have.key('42:7');
+            });
+        });
+        it('should forget a rejected load', () => {
+            load = Promise.reject(new Error('topic gone'));
+            const result = internals.load_context(topic);
+            internals.pending_context.should.have.key('42:7');
+            return result.should.be.rejectedWith('topic gone').then(() => tick()).then(() => {
+                internals.pending_context.should.not.have.key('42:7');
+                internals.load_context(topic);
+                topic.getLatestPosts.should.have.been.calledTwice;
+            });
+        });
+    });
+    describe('convertHtmlToMarkdown()', () => {
+        let internals = null;
+        const html = (i) => `<p>post ${i}</p>`;
+        beforeEach(() => {
+            internals = testModule.internals;
+            internals.md_cache.clear();
+            sandbox.spy(internals.nhm, 'translate');
+        });
+        it('should translate a repeated post only once', () => {
+            const first = internals.toMarkdown(html(1));
+            internals.toMarkdown(html(1)).should.equal(first);
+            internals.nhm.translate.should.have.been.calledOnce;
+        });
+        it('should move a cache hit to the most recently used position', () => {
+            internals.toMarkdown(html(1));
+            internals.toMarkdown(html(2));
+            internals.toMarkdown(html(1));
+            Array.from(internals.md_cache.keys()).should.eql([html(2), html(1)]);
+        });
+        it('should stay bounded at the cache size', () => {
+            for (let i = 0; i <= internals.md_cache_size; i += 1) {
+                internals.toMarkdown(html(i));
+            }
+            internals.md_cache.size.should.equal(internals.md_cache_size);
+            internals.md_cache.has(html(0)).should.be.false;
+        });
+        it('should evict the least recently used post first', () => {
+            for (let i = 0; i < internals.md_cache_size; i += 1) {
+                internals.toMarkdown(html(i));
+            }
+            internals.toMarkdown(html(0));
+            internals.toMarkdown(html(internals.md_cache_size));
+            internals.md_cache.has(html(0)).should.be.true;
+            internals.md_cache.has(html(1)).should.be.false;
+        });
+    });
+});
@@ -162,6 +162,15 @@ describe('providers/nodebb', () => {
                 data.config.core.forum = expected;
                 forum.url.should.eql(expected);
             });
+            it('should not clone config to read url', () => {
+                const spy = sinon.spy(JSON, 'stringify');
+                try {
+                    forum.url; // eslint-disable-line no-unused-expressions
+                    spy.should.not.have.been.called;
+                } finally {
+                    spy.restore();
+                }
+            });
         });
         describe('get username', () => {
             let forum = null,
@@ -177,6 +186,15 @@ describe('providers/nodebb', () => {
                 data.config.core.username = expected;
                 forum.username.should.eql(expected);
             });
+            it('should not clone config to read username', () => {
+                const spy = sinon.spy(JSON, 'stringify');
+                try {
+                    forum.username; // eslint-disable-line no-unused-expressions
+                    spy.should.not.have.been.called;
+                } finally {
+                    spy.restore();
+                }
+            });
         });
         describe('get important users', () => {
             let forum = null,
@@ -1021,6 +1039,21 @@ describe('providers/nodebb', () => {
                 forum._emit.callCount.should.equal(5);
             });
         });
+        it('should wait the same delay before every retry', () => {
+            const err = new Error('[[error:too-many-bananas]]');
+            forum._emit.rejects(err);
+            sandbox.stub(global, 'setTimeout').callsFake((fn) => fn());
+            return forum._emitWithRetry(3, 'seven', 'ten').should.be.rejectedWith(err).then(() => {
+                global.setTimeout.args.map((args) => args[1]).should.eql([3, 3, 3, 3]);
+            });
+        });
+        it('should resolve to result of successful retry', () => {
+            const err = new Error('[[error:too-many-bananas]]');
+            const expected = Math.random();
+            forum._emit.onFirstCall().rejects(err);
+            forum._emit.onSecondCall().resolves(expected);
+            return forum._emitWithRetry(1, 'seven', 'ten').should.become(expected);
+        });
     });
     describe('fetchObject', () => {
         let forum = null,